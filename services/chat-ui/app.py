@@ -1,88 +1,73 @@
 """Flask Chat UI for MCP tools."""
 
-import json
+import atexit
+import functools
+import hashlib
+import itertools
 import os
+import re
+import threading
 import time
-import requests
-from datetime import datetime
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
 from typing import Any, Dict, List
 
-import tempfile
 import logging
-from flask import Flask, render_template, request, jsonify, session, send_file, make_response
+import orjson
+import xxhash
+import zstandard
+from cachetools import TTLCache
+from flask import Flask, Response, render_template, request, jsonify, make_response, stream_with_context
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from dotenv import load_dotenv
 
-from mcp_client import get_server_catalogs, invoke_tool_on_server, get_api_call_history, get_context_windows
+# Apply .env before anything below (or in cache/mcp_client) reads its settings
+load_dotenv()
+
+from mcp_client import get_server_catalogs, invoke_tool_on_server, get_api_call_history, get_context_windows, http_session
+from cache import bump_version, cached, get_version
+
+# Arguments worth logging for the well-known Nautobot tools; other tools log their argument names.
+# Any tool a selected server advertises is run, with args forwarded as given
+_TOOL_LOG_ARGS = {
+    'get_prefixes_by_location_enhanced': ('location_name', 'format'),
+    'get_devices_by_location': ('location_name',),
+    'get_devices_by_location_and_role': ('location_name', 'role_name'),
+    'get_interfaces_by_device': ('device_name',),
+    'get_circuits_by_location': ('location_names',),
+    'get_locations': (),
+    'get_providers': (),
+    'get_circuits_by_provider': ('provider_name',),
+}
 
 def execute_tool_with_status(tool_name, args, server_name, start_time, round_num, tool_index, total_tools):
     """Execute a tool with detailed status logging and progress tracking."""
-    import time
-    logger.info(f"[STATUS] Starting tool execution: {tool_name} (Round {round_num}, Tool {tool_index}/{total_tools}) at {time.time() - start_time:.2f}s")
-    
-    # Log tool-specific details
-    if tool_name == 'get_prefixes_by_location_enhanced':
-        location_name = args.get('location_name', '')
-        fmt = args.get('format', 'json')
-        logger.info(f"[STATUS] Querying prefixes for location '{location_name}' in {fmt} format")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Prefix query completed for '{location_name}' - found {api_result.get('result', {}).get('count', 0)} prefixes")
-        
-    elif tool_name == 'get_devices_by_location':
-        location_name = args.get('location_name', '')
-        logger.info(f"[STATUS] Querying devices for location '{location_name}'")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Device query completed for '{location_name}' - found {api_result.get('result', {}).get('count', 0)} devices")
-        
-    elif tool_name == 'get_devices_by_location_and_role':
-        location_name = args.get('location_name', '')
-        role_name = args.get('role_name', '')
-        logger.info(f"[STATUS] Querying devices for location '{location_name}' with role '{role_name}'")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Device+role query completed for '{location_name}'/'{role_name}' - found {api_result.get('result', {}).get('count', 0)} devices")
-        
-    elif tool_name == 'get_interfaces_by_device':
-        device_name = args.get('device_name', '')
-        logger.info(f"[STATUS] Querying interfaces for device '{device_name}'")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Interface query completed for '{device_name}' - found {api_result.get('result', {}).get('count', 0)} interfaces")
-        
-    elif tool_name == 'get_circuits_by_location':
-        location_names = args.get('location_names', [])
-        logger.info(f"[STATUS] Querying circuits for locations: {location_names}")
-        
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        
-        logger.info(f"[STATUS] Circuit query completed for locations {location_names} - found {api_result.get('result', {}).get('count', 0)} circuits")
-        
-    elif tool_name == 'get_locations':
-        logger.info(f"[STATUS] Querying all available locations")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Locations query completed - found {api_result.get('result', {}).get('count', 0)} locations")
-        
-    elif tool_name == 'get_providers':
-        logger.info(f"[STATUS] Querying all available providers")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Providers query completed - found {api_result.get('result', {}).get('count', 0)} providers")
-        
-    elif tool_name == 'get_circuits_by_provider':
-        provider_name = args.get('provider_name', '')
-        logger.info(f"[STATUS] Querying circuits for provider '{provider_name}'")
-        api_result = invoke_tool_on_server(server_name, tool_name, args)
-        logger.info(f"[STATUS] Circuits by provider query completed for '{provider_name}' - found {api_result.get('result', {}).get('count', 0)} circuits")
-        
-    else:
-        logger.info(f"[STATUS] Executing unknown tool: {tool_name}")
-        api_result = {"error": f"Unknown tool {tool_name}"}
+    log_info = logger.isEnabledFor(logging.INFO)
+    if log_info:
+        logger.info("[STATUS] Starting tool execution: %s (Round %s, Tool %s/%s) at %.2fs", tool_name, round_num, tool_index, total_tools, time.perf_counter() - start_time)
     
-    execution_time = time.time() - start_time
-    logger.info(f"[STATUS] Tool '{tool_name}' completed in {execution_time:.2f}s (Round {round_num}, Tool {tool_index}/{total_tools})")
+    if log_info:
+        log_args = _TOOL_LOG_ARGS.get(tool_name)
+        if log_args is not None:
+            details = ", ".join(f"{key}={args.get(key)!r}" for key in log_args)
+        else:
+            details = ", ".join(args)
+        logger.info("[STATUS] Querying %s(%s) on %s", tool_name, details, server_name)
+    api_result = invoke_tool_on_server(server_name, tool_name, args)
+    if log_info:
+        result = api_result.get('result')
+        logger.info("[STATUS] %s completed - found %s results", tool_name, result.get('count', 0) if isinstance(result, dict) else 0)
+        logger.info("[STATUS] Tool '%s' completed in %.2fs (Round %s, Tool %s/%s)", tool_name, time.perf_counter() - start_time, round_num, tool_index, total_tools)
     
     return api_result
 
 def discover_tools_from_mcp_server(server_name):
     """Dynamically discover tools from MCP server."""
     try:
-        tools_response = requests.get(f"http://{server_name}:7001/tools", timeout=5)
+        tools_response = http_session.get(f"http://{server_name}:7001/tools", timeout=5)
         if tools_response.status_code == 200:
             mcp_tools = tools_response.json().get("tools", [])
             tools = []
@@ -97,17 +82,19 @@ def discover_tools_from_mcp_server(server_name):
                     }
                 }
                 tools.append(openai_tool)
-            logger.info(f"Discovered {len(tools)} tools from MCP server")
+            # A stable order keeps the request prefix byte-identical for OpenAI's prompt cache
+            tools.sort(key=lambda tool: tool["function"]["name"])
+            logger.info("Discovered %s tools from MCP server %s", len(tools), server_name)
             return tools
         else:
-            logger.warning(f"Failed to get tools from MCP server: {tools_response.status_code}")
+            logger.warning("Failed to get tools from MCP server %s: %s", server_name, tools_response.status_code)
             return []
     except Exception as e:
-        logger.error(f"Error discovering tools from MCP server: {e}")
+        logger.error("Error discovering tools from MCP server %s: %s", server_name, e)
         return []
 
 try:
-    from openai import OpenAI  # Optional: only used if OPENAI_API_KEY is set
+    from openai import OpenAI, DefaultHttpxClient, Timeout  # Optional: only used if OPENAI_API_KEY is set
 except Exception:
     OpenAI = None
 
@@ -116,50 +103,275 @@ from exporters import export_json, export_markdown
 logger = logging.getLogger(__name__)
 
 # MongoDB setup
-from pymongo import MongoClient
-from bson import ObjectId
+from pymongo import MongoClient, ReturnDocument
+from bson import Binary, Decimal128, ObjectId
+from pymongo.errors import PyMongoError
 MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 MONGO_DB = os.environ.get('MONGO_DB', 'nautobot_mcp')
-mongo_client = MongoClient(MONGO_URI)
+TOOL_HISTORY_TTL_DAYS = int(os.environ.get('TOOL_HISTORY_TTL_DAYS', '7'))
+# Export job records are only polled until the file is ready
+EXPORT_JOB_TTL = int(os.environ.get('EXPORT_JOB_TTL', '3600'))
+mongo_client = MongoClient(
+    MONGO_URI,
+    appname='chat-ui',
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '50')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '5')),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '2000')),
+    connectTimeoutMS=2000,
+    waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')),
+    socketTimeoutMS=int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '10000')),
+    # Message/tool arrays are repetitive JSON; falls back to uncompressed if zstd is unavailable
+    compressors='zstd,zlib',
+)
+# Close pooled connections cleanly when the worker exits. Workers import the app after
+# gunicorn forks (no preload_app), so every process builds its own client.
+atexit.register(mongo_client.close)
 mongo_db = mongo_client[MONGO_DB]
 conversations_col = mongo_db.get_collection('conversations')
+archives_col = mongo_db.get_collection('conversation_archives')
+# Archive bodies share their archive's _id, so listing archives never pulls message payloads
+archive_messages_col = mongo_db.get_collection('archive_messages')
+# Tool results are large and only recent ones matter, so they live outside the conversation doc
+tools_col = mongo_db.get_collection('tool_invocations')
+export_jobs_col = mongo_db.get_collection('export_jobs')
 
-load_dotenv()
+# Each index is ensured on its own, so one that can't be built (e.g. the unique session index over
+# duplicate rows left by older versions) doesn't keep the TTL and query indexes from being created
+_INDEXES = [
+    (conversations_col, 'session_id', {'unique': True}),
+    (archives_col, [('session_id', 1), ('archived_at', -1)], {}),
+    (archive_messages_col, [('session_id', 1), ('offset', 1)], {}),
+    (tools_col, [('session_id', 1), ('tool', 1), ('created_at', -1)], {}),
+    (tools_col, [('session_id', 1), ('tool', 1), ('args_key', 1), ('created_at', 1)], {}),
+    (tools_col, [('session_id', 1), ('created_at', -1)], {}),
+    (tools_col, 'created_at', {'expireAfterSeconds': TOOL_HISTORY_TTL_DAYS * 24 * 3600}),
+    (export_jobs_col, 'created_at', {'expireAfterSeconds': EXPORT_JOB_TTL}),
+]
+for _col, _keys, _options in _INDEXES:
+    try:
+        _col.create_index(_keys, **_options)
+    except PyMongoError as e:
+        logger.warning("Failed to ensure MongoDB index %s on %s: %s", _keys, _col.name, e)
+
+# Recently used conversation docs as (version, doc), so follow-up turns and context polls skip the
+# find_one. The version counter catches writes from other workers; the short TTL bounds staleness
+# when it can't be read.
+_conv_cache = TTLCache(maxsize=1024, ttl=int(os.environ.get('CONV_CACHE_TTL', '10')))
+_conv_cache_lock = threading.Lock()
+# Turns saved to the same session from this worker take these in order, so the cached
+# window gets them in the order MongoDB stored them
+_conv_write_locks = [threading.Lock() for _ in range(64)]
+
+# Conversation docs keep at most this many turns (a user message and its answer each); older
+# messages are rolled over into archive_messages, so exports and archives still get the full log
+MAX_STORED_TURNS = int(os.environ.get('MAX_STORED_TURNS', '100'))
+MAX_STORED_MESSAGES = 2 * MAX_STORED_TURNS
+# Messages moved per rollover, so it happens every few dozen turns rather than on each one
+_ROLLOVER_MESSAGES = max(MAX_STORED_MESSAGES // 2, 2)
+# Messages loaded (and cached) per conversation: the history window replayed to the model
+CONVERSATION_WINDOW = 25
+# Tool invocations loaded to stitch prior results into the OpenAI context
+TOOL_CONTEXT_LIMIT = 10
+_TOOL_PROJECTION = {'_id': 0, 'session_id': 0, 'created_at': 0, 'args_key': 0}
+
+# Exports run off the request thread; job state lives in MongoDB so any worker can answer a poll
+_EXPORT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='export')
+_EXPORTERS = {'json': export_json, 'markdown': export_markdown}
+# Encoded /api/chat-history bodies by (session_id, archive version); the version changes on every
+# archive write or delete, the TTL bounds staleness if it can't be read
+_archive_list_cache = TTLCache(maxsize=1024, ttl=int(os.environ.get('ARCHIVE_LIST_CACHE_TTL', '15')))
+_archive_list_lock = threading.Lock()
+
+# Archiving a cleared or replaced conversation happens after the response is sent
+_ARCHIVE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='archive')
+
+# Independent MCP tool calls from the same LLM round run side by side
+_TOOL_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('TOOL_POOL_SIZE', '8')),
+    thread_name_prefix='mcp-tool'
+)
+# Tool catalogs of the selected servers are fetched side by side when a chat uses more than one
+_DISCOVER_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='mcp-discover')
+
+_SYSTEM_PROMPT = (
+    "You are a helpful general-purpose assistant with access to Nautobot network data tools. "
+    "You can call multiple MCP tools in sequence to gather comprehensive information. "
+    "IMPORTANT GUIDELINES: "
+    "1. For complex questions, use multiple tools to gather different types of data (devices, prefixes, circuits, etc.) "
+    "2. You can chain tool calls - use results from one tool to inform subsequent tool calls "
+    "3. Always use conversation history to resolve pronouns and follow-ups "
+    "4. If the user asks to reformat or export 'that' or 'those results', use the most recent relevant results "
+    "5. Use markdown formatting for better readability with proper table syntax "
+    "6. When analyzing network data, consider relationships between devices, prefixes, circuits, and locations "
+    "7. For comprehensive analysis, gather data from multiple sources before providing insights "
+    "8. You can chain tool calls - get devices first, then get their interfaces for detailed analysis "
+    "9. Use exact location codes (e.g., 'BRCN', 'NYDC') - full names will fail "
+    "Available tools: get_prefixes_by_location_enhanced, get_devices_by_location, get_devices_by_location_and_role, get_interfaces_by_device, get_circuits_by_location, get_locations, get_providers, get_circuits_by_provider"
+)
+_SYSTEM_MSG = {"role": "system", "content": _SYSTEM_PROMPT}
+
+# Tool results sent to the model keep at most this many items per list; the stored result stays whole
+TOOL_RESULT_ITEM_LIMIT = int(os.environ.get('TOOL_RESULT_ITEM_LIMIT', '50'))
+_TOOL_RESULT_LISTS = ('data', 'prefixes', 'devices', 'interfaces', 'circuits')
+_TOOL_RESULT_BLOBS = ('raw', 'html')
+
+# Failed turns are stored with this prefix and left out when history is replayed to the model
+_ERR_PREFIX = "Error processing request:"
+
+# History is replayed with every prompt except clearly standalone ones: a prompt naming its own
+# target ("devices at NYDC", "list all providers") with no wording that refers back to earlier turns
+_NEEDS_CONTEXT = re.compile(
+    r'\b(this|that|those|these|it|its|they|them|their|here|again|reformat|export|same|previous|last|first|second|'
+    r'above|also|instead|now|then|what about|how about)\b',
+    re.I
+)
+_STANDALONE = re.compile(r'\b(at|in|for|from|on|of)\s+[A-Z][A-Z0-9_.-]{2,}\b|\b(list|show|get) all\b')
+
+# Pleasantries answered locally; they never need tools or conversation context. They are only
+# short-circuited when the last answer didn't ask the user something, since then they may be a reply
+_TRIVIAL_RE = re.compile(r'^(hi|hello|hey|thanks|thank you|bye)[.!?]*$')
+_CANNED_REPLIES = {
+    'hi': "Hello! Ask me about devices, prefixes, circuits or locations in Nautobot.",
+    'hello': "Hello! Ask me about devices, prefixes, circuits or locations in Nautobot.",
+    'hey': "Hello! Ask me about devices, prefixes, circuits or locations in Nautobot.",
+    'thanks': "You're welcome! Let me know if you need anything else.",
+    'thank you': "You're welcome! Let me know if you need anything else.",
+    'bye': "Goodbye!",
+}
+
+# Recent model answers by (session, servers, prompt, replayed history), so retries and repeated
+# questions skip OpenAI and the MCP servers; the tools are read-only, so replaying is safe.
+# Entries hold the answer only: its tool results are already stored with the session
+_reply_cache = TTLCache(maxsize=512, ttl=int(os.environ.get('REPLY_CACHE_TTL', '300')))
+_reply_cache_lock = threading.Lock()
+
+# One OpenAI client per worker so requests reuse pooled HTTP/2 connections instead of a TLS handshake each
+_OPENAI = None
+_OPENAI_LOCK = threading.Lock()
 
 app = Flask(__name__)
 app.secret_key = 'nautobot-mcp-chat-secret-key'
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
 
+# Chat payloads are repetitive JSON/HTML and compress well; SSE responses stay uncompressed
+# so tokens are flushed to the browser as they arrive
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_LEVEL'] = 5
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
+
+
+def _json_default(obj):
+    """Serialize the Mongo types orjson does not know about; datetimes are handled natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        obj = obj.to_decimal()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson for jsonify, request parsing and tojson."""
+
+    # Same knobs as Flask's default provider; responses are compact and unsorted unless asked otherwise
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent', None if self.compact else 2):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_json_default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = ORJSONProvider(app)
+
+# Tool catalogs change rarely; serve them from Redis for this many seconds
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', '60'))
+
+
+def _conditional_json(payload):
+    """Serialize payload once, tag it with an ETag and answer 304 if the client already has it."""
+    return _conditional_body(orjson.dumps(payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS))
+
+
+def _conditional_body(body):
+    """Wrap an encoded JSON body in a response that answers 304 if the client already has it."""
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.blake2b(body, digest_size=8).hexdigest())
+    # Let the browser keep a copy but revalidate it on every poll
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+# Encoded bodies of session-scoped JSON views, keyed by (path, session_id, conversation version)
+_response_cache = TTLCache(maxsize=1024, ttl=2)
+_response_cache_lock = threading.Lock()
+
+
+def cached_response(view):
+    """Serve a session's JSON view from a short-lived cache of its encoded body.
+
+    Every conversation write bumps the version in the key, so a hit is never older
+    than the session's last turn and skips Mongo and serialization entirely.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        session_id = request.cookies.get('session_id')
+        version = get_version(f'conv:ver:{session_id}') if session_id else None
+        if version is None:
+            return view(*args, **kwargs)
+
+        key = (request.path, session_id, version)
+        with _response_cache_lock:
+            body = _response_cache.get(key)
+        if body is not None:
+            return _conditional_body(body)
+
+        response = view(*args, **kwargs)
+        if response.status_code == 200 and response.mimetype == 'application/json':
+            with _response_cache_lock:
+                _response_cache[key] = response.get_data()
+        return response
+    return wrapper
+
+
+def _all_servers_ok(catalogs):
+    """Only cache catalog snapshots in which every server answered."""
+    return all('error' not in catalog for catalog in catalogs.values())
+
 
 @app.route('/')
 def index():
     """Main chat interface."""
     # Get server catalogs
-    catalogs = get_server_catalogs()
+    catalogs = cached('mcp:catalogs', CATALOG_CACHE_TTL, get_server_catalogs, _all_servers_ok)
+    now = datetime.now(timezone.utc)
     
     # Get or create session ID from request
     session_id = request.cookies.get('session_id')
     if not session_id:
         # Create a new session
-        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        session_id = f"session_{now.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
     
-    # Get or create conversation for this session
-    conv_doc = conversations_col.find_one({'session_id': session_id})
-    if not conv_doc:
-        # Create a new conversation document for this session
-        conv = {
-            'session_id': session_id,
-            'created_at': datetime.now().isoformat(),
-            'messages': [],
-            'tools': []
-        }
-        inserted = conversations_col.insert_one(conv)
-        conv_doc = conv
+    # Get or create conversation for this session; an upsert, so concurrent first requests don't collide
+    conv_doc = conversations_col.find_one_and_update(
+        {'session_id': session_id},
+        {'$setOnInsert': {'created_at': now.isoformat(), 'messages': []}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
     
     # Load conversation data
     chat_history = conv_doc.get('messages', [])
-    tool_history = conv_doc.get('tools', [])
     
     response = make_response(render_template('index.html', 
                          catalogs=catalogs,
@@ -175,10 +387,13 @@ def index():
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat requests."""
-    import time
-    start_time = time.time()
+    start_time = time.perf_counter()
+    now_iso = datetime.now(timezone.utc).isoformat()
     
-    data = request.get_json()
+    try:
+        data = orjson.loads(request.get_data() or b'{}')
+    except orjson.JSONDecodeError:
+        return jsonify({'error': 'Invalid JSON body'}), 400
     prompt = data.get('message', '')
     selected_servers = data.get('selected_servers', [])
     
@@ -191,96 +406,492 @@ def chat():
         return jsonify({'error': 'No session ID found'})
     
     # Get conversation for this session
-    conv_doc = conversations_col.find_one({'session_id': session_id})
+    conv_doc = _get_conversation(session_id)
     if not conv_doc:
         return jsonify({'error': 'No conversation found for session'})
     
-    # Load conversation data
-    chat_history = conv_doc.get('messages', [])
-    tool_history = conv_doc.get('tools', [])
+    # Load conversation data; the cached list is shared, so this request extends a copy
+    chat_history = list(conv_doc.get('messages', []))
+    recent_history = _replayed_history(prompt, chat_history)
+    # Prior results are only needed for the turns replayed to the model
+    cited_tools = {c.get('tool') for turn in recent_history for c in turn.get('citations') or []}
+    tool_history = _session_tools(session_id, cited_tools, TOOL_CONTEXT_LIMIT, inflate=False) if cited_tools else []
+    
+    events = _chat_events(prompt, selected_servers, session_id, chat_history, recent_history,
+                          conv_doc['message_count'], tool_history, start_time, now_iso)
+    
+    if data.get('stream'):
+        return Response(
+            stream_with_context(_sse_stream(events)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    # Non-streaming clients only need the final payload
+    payload = None
+    for kind, event in events:
+        if kind == 'done':
+            payload = event
+    return jsonify(payload)
+
+
+def _get_conversation(session_id, fetch=True):
+    """Return a session's recent conversation, from the worker cache when still current.
+    
+    The doc holds the last CONVERSATION_WINDOW messages and the stored message_count.
+    Persisted turns replace the cached doc rather than change it, so it is shared
+    between requests; treat it as read-only.
+    With fetch=False a cache miss returns None instead of querying MongoDB.
+    """
+    version = get_version(f'conv:ver:{session_id}')
+    with _conv_cache_lock:
+        entry = _conv_cache.get(session_id)
+    if entry is not None and version is not None and entry[0] == version:
+        return entry[1]
+    if not fetch:
+        return None
+    conv_doc = _fetch_tail(session_id, CONVERSATION_WINDOW)
+    if conv_doc and version is not None:
+        with _conv_cache_lock:
+            _conv_cache[session_id] = (version, conv_doc)
+    return conv_doc
+
+
+def _conversation_tail(session_id, n):
+    """Return (last n messages, total message count), or None if the session has no conversation.
+    
+    Served from the worker cache when possible; otherwise MongoDB slices the array
+    so only the tail crosses the wire.
+    """
+    conv_doc = _get_conversation(session_id, fetch=False) if n <= CONVERSATION_WINDOW else None
+    if conv_doc is None:
+        conv_doc = _fetch_tail(session_id, n)
+        if conv_doc is None:
+            return None
+    return conv_doc['messages'][-n:], conv_doc['message_count']
+
+
+def _fetch_tail(session_id, n):
+    """Load {'messages': last n messages, 'message_count': total} for a session, or None.
+    
+    The total includes messages already rolled over out of the conversation doc.
+    """
+    for doc in conversations_col.aggregate([
+        {'$match': {'session_id': session_id}},
+        {'$limit': 1},
+        {'$project': {
+            '_id': 0,
+            'message_count': {'$add': [
+                {'$size': {'$ifNull': ['$messages', []]}},
+                {'$ifNull': ['$rolled_over', 0]}
+            ]},
+            'messages': {'$slice': [{'$ifNull': ['$messages', []]}, -n]}
+        }}
+    ]):
+        return doc
+    return None
+
+
+def _save_turn(session_id, turns, tool_entries, updated_at):
+    """Append a chat turn to Mongo, then to the worker's cached window once the write succeeded."""
+    with _conv_write_locks[hash(session_id) % len(_conv_write_locks)]:
+        # Only the first message past the cap comes back, if there is one
+        conv_doc = conversations_col.find_one_and_update(
+            {'session_id': session_id},
+            {
+                '$push': {'messages': {'$each': turns}},
+                '$set': {'updated_at': updated_at}
+            },
+            projection={'_id': 0, 'messages': {'$slice': [MAX_STORED_MESSAGES, 1]}},
+            return_document=ReturnDocument.AFTER
+        )
+        # Store tool results before bumping the version so cached responses never see half a turn
+        _save_tool_invocations(session_id, tool_entries)
+        _conversation_appended(session_id, turns)
+    if conv_doc and conv_doc.get('messages'):
+        _ARCHIVE_POOL.submit(_roll_over_messages, session_id)
+
+
+def _roll_over_messages(session_id):
+    """Move a conversation's oldest messages past MAX_STORED_MESSAGES into archive_messages.
+    
+    The chunk is written first and records its offset (the doc's rolled_over count),
+    so readers can tell which chunks hold messages already gone from the doc. The trim
+    then only applies if the array still has the length and offset it was measured at;
+    a turn saved in between (or another worker rolling over first) makes it a no-op,
+    the chunk is deleted and the next save past the cap tries again. The recent window
+    and the message count are unchanged, so cached docs stay valid.
+    """
+    try:
+        stats = next(conversations_col.aggregate([
+            {'$match': {'session_id': session_id}},
+            {'$limit': 1},
+            {'$project': {
+                '_id': 0,
+                'n': {'$size': {'$ifNull': ['$messages', []]}},
+                'rolled_over': {'$ifNull': ['$rolled_over', 0]}
+            }}
+        ]), None)
+        if stats is None or stats['n'] <= MAX_STORED_MESSAGES:
+            return
+        stored, offset = stats['n'], stats['rolled_over']
+        moved = min(max(stored - MAX_STORED_MESSAGES, _ROLLOVER_MESSAGES), stored - 1)
+        # Messages are only ever appended (or cleared), so the head read here is what gets trimmed
+        conv_doc = conversations_col.find_one({'session_id': session_id}, {'_id': 0, 'messages': {'$slice': moved}})
+        chunk_id = archive_messages_col.insert_one({
+            'session_id': session_id,
+            'rolled_over_at': datetime.now(timezone.utc),
+            'offset': offset,
+            'messages': conv_doc['messages']
+        }).inserted_id
+        trimmed = conversations_col.update_one(
+            {
+                'session_id': session_id,
+                'rolled_over': offset if offset else {'$in': [0, None]},
+                f'messages.{stored - 1}': {'$exists': True},
+                f'messages.{stored}': {'$exists': False}
+            },
+            {
+                '$push': {'messages': {'$each': [], '$slice': moved - stored}},
+                '$inc': {'rolled_over': moved}
+            }
+        )
+        if not trimmed.matched_count:
+            archive_messages_col.delete_one({'_id': chunk_id})
+    except Exception as e:
+        logger.error("Failed to roll over messages for %s: %s", session_id, e)
+
+
+def _conversation_appended(session_id, turns):
+    """Apply a persisted chat turn to the cached doc and make other workers refetch theirs."""
+    version = bump_version(f'conv:ver:{session_id}')
+    with _conv_cache_lock:
+        entry = _conv_cache.get(session_id)
+        if entry is None:
+            return
+        if version is not None and version == entry[0] + 1:
+            conv_doc = entry[1]
+            _conv_cache[session_id] = (version, {
+                'messages': (conv_doc['messages'] + turns)[-CONVERSATION_WINDOW:],
+                'message_count': conv_doc['message_count'] + len(turns)
+            })
+        else:
+            # Someone else wrote in between; the cached window may be missing their turn
+            _conv_cache.pop(session_id, None)
+
+
+def _forget_conversation(session_id):
+    """Invalidate a session's cached doc in every worker after it changes outside a chat turn."""
+    bump_version(f'conv:ver:{session_id}')
+    with _conv_cache_lock:
+        _conv_cache.pop(session_id, None)
+
+
+def _session_tools(session_id, tool_names=None, limit=0, inflate=True, until=None):
+    """Return a session's stored tool invocations, oldest first.
+    
+    Args:
+        session_id: Conversation session
+        tool_names: Only return invocations of these tools
+        limit: Only return the newest N invocations (0 for all)
+        inflate: Decompress every result up front; otherwise use _tool_result() on demand
+        until: Only return invocations stored at or before this UTC datetime
+    """
+    query = {'session_id': session_id}
+    if tool_names is not None:
+        query['tool'] = {'$in': list(tool_names)}
+    if until is not None:
+        query['created_at'] = {'$lte': until}
+    cursor = tools_col.find(query, _TOOL_PROJECTION).sort([('created_at', -1), ('_id', -1)]).limit(limit)
+    entries = list(cursor)[::-1]
+    if inflate:
+        for entry in entries:
+            _tool_result(entry)
+    return entries
+
+
+def _tool_result(entry):
+    """Return a stored tool invocation's result, decompressing it in place if needed."""
+    if 'result_zstd' in entry:
+        entry['result'] = orjson.loads(zstandard.decompress(entry.pop('result_zstd')))
+    return entry.get('result', {})
+
+
+def _save_tool_invocations(session_id, tool_entries):
+    """Store the tool calls made during a chat turn, with results zstd-compressed."""
+    if tool_entries:
+        created_at = datetime.now(timezone.utc)
+        docs = []
+        for entry in tool_entries:
+            doc = {'session_id': session_id, 'created_at': created_at}
+            doc.update((k, v) for k, v in entry.items() if k != 'result')
+            doc['args_key'] = _args_key(_tool_key(entry.get('tool'), entry.get('args', {}))[1])
+            doc['result_zstd'] = Binary(zstandard.compress(orjson.dumps(entry.get('result', {})), 3))
+            docs.append(doc)
+        tools_col.insert_many(docs)
+
+
+def _tool_key(tool_name, args):
+    """Hashable key identifying a tool call by name and (order-insensitive) arguments."""
+    return tool_name, orjson.dumps(args, option=orjson.OPT_SORT_KEYS)
+
+
+def _args_key(args_json):
+    """Short digest of a call's sorted-args JSON, stored on each invocation so it can be looked up by index."""
+    return xxhash.xxh3_64_hexdigest(args_json)
+
+
+def _find_tool(session_id, key):
+    """Fetch the earliest stored invocation matching a _tool_key() without loading the session's history."""
+    tool_name, args_json = key
+    return tools_col.find_one(
+        {'session_id': session_id, 'tool': tool_name, 'args_key': _args_key(args_json)},
+        _TOOL_PROJECTION,
+        sort=[('created_at', 1), ('_id', 1)]
+    )
+
+
+def _build_tool_index(tool_history):
+    """Map (tool, args) keys to stored tool entries; the earliest wins, as a front-to-back scan would find."""
+    tool_index = {}
+    for tool_entry in tool_history:
+        tool_index.setdefault(_tool_key(tool_entry.get('tool'), tool_entry.get('args', {})), tool_entry)
+    return tool_index
+
+
+def _tool_call_id(tool_name, call_seq):
+    """Synthesize a tool_call_id for a stored tool call replayed to OpenAI.
+    
+    call_seq is an itertools.count() per message build, so ids never collide within a request.
+    """
+    return f"call_{tool_name[:15]}_{next(call_seq):04d}"
+
+
+def _summarize_tool_result(tool_result, limit=TOOL_RESULT_ITEM_LIMIT):
+    """Shrink a tool result for the model: cap long lists and drop raw blobs.
+    
+    Returns tool_result itself when nothing needs trimming; dropped item counts are
+    reported under 'truncated' so the model knows the data is partial.
+    """
+    if not isinstance(tool_result, dict):
+        return tool_result
+    summary = None
+    for key in _TOOL_RESULT_BLOBS:
+        if key in tool_result:
+            summary = summary or dict(tool_result)
+            del summary[key]
+    for key in _TOOL_RESULT_LISTS:
+        items = tool_result.get(key)
+        if isinstance(items, list) and len(items) > limit:
+            summary = summary or dict(tool_result)
+            summary[key] = items[:limit]
+            summary.setdefault('truncated', {})[key] = len(items) - limit
+    return summary or tool_result
+
+
+def _server_tools(server_name):
+    """Return a server's tools in OpenAI format, cached and served stale if a refresh fails."""
+    return cached(f'mcp:tools:{server_name}', CATALOG_CACHE_TTL,
+                  lambda: discover_tools_from_mcp_server(server_name), bool, serve_stale=True)
+
+
+def _discover_tools(server_names):
+    """Merge the tools of every selected server.
+    
+    Returns the OpenAI tool list and a tool name -> server routing table; if two
+    servers offer the same tool, the one selected first serves it.
+    """
+    if len(server_names) == 1:
+        catalogs = [_server_tools(server_names[0])]
+    else:
+        catalogs = list(_DISCOVER_POOL.map(_server_tools, server_names))
+    
+    tools, tool_routes = [], {}
+    for server_name, server_tools in zip(server_names, catalogs):
+        for tool in server_tools:
+            name = tool["function"]["name"]
+            if name not in tool_routes:
+                tool_routes[name] = server_name
+                tools.append(tool)
+    return tools, tool_routes
+
+
+def _tool_failed(tool_result):
+    """True for a tool result reporting failure, from the MCP server or from the call itself."""
+    return isinstance(tool_result, dict) and (tool_result.get('success') is False or 'error' in tool_result)
+
+
+def _is_error_turn(turn):
+    """True for an assistant turn recording a failed request."""
+    return turn.get("role") == "assistant" and turn.get("text", "").startswith(_ERR_PREFIX)
+
+
+def _reply_cache_key(session_id, server_names, prompt, recent_history):
+    """Key a prompt by its session, the servers it can use and the history replayed with it.
+    
+    recent_history is exactly what the model sees before the prompt, cited tool
+    arguments included, so follow-ups only share an answer when their context matches.
+    Keys are per session: a hit's citations refer to tool results stored with the
+    session's original turn, which follow-ups replay.
+    """
+    context = [[turn.get('role'), turn.get('text'), turn.get('citations') or []] for turn in recent_history]
+    return hashlib.blake2b(
+        orjson.dumps([session_id, server_names, prompt.strip(), context], option=orjson.OPT_SORT_KEYS),
+        digest_size=16
+    ).digest()
+
+
+def _sse_stream(events):
+    """Encode chat events as Server-Sent Events.
+    
+    If the client goes away mid-answer the server closes this generator; the turn
+    is still run to completion, unsent, so it is persisted like a buffered request.
+    """
+    try:
+        for kind, event in events:
+            yield b'data: ' + orjson.dumps({'type': kind, **event}) + b'\n\n'
+    finally:
+        for _ in events:
+            pass
+
+
+def _openai_client():
+    """Return the worker's shared OpenAI client, creating it on first use."""
+    global _OPENAI
+    if _OPENAI is None:
+        with _OPENAI_LOCK:
+            if _OPENAI is None:
+                _OPENAI = OpenAI(
+                    http_client=DefaultHttpxClient(http2=True),
+                    timeout=Timeout(60.0, connect=5.0)
+                )
+    return _OPENAI
+
+
+def _stream_completion(client, **kwargs):
+    """Stream an OpenAI chat completion.
+    
+    Yields ('delta', ...) events for content as it arrives and returns the
+    assembled (content, tool_calls) once the stream ends; tool_calls are
+    OpenAI-format dicts ready to be sent back in the next request.
+    """
+    content_parts = []
+    tool_calls = {}
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content_parts.append(delta.content)
+            yield 'delta', {'delta': delta.content}
+        for tc in delta.tool_calls or []:
+            entry = tool_calls.setdefault(tc.index, {
+                "id": "",
+                "type": "function",
+                "function": {"name": "", "arguments": ""}
+            })
+            if tc.id:
+                entry["id"] = tc.id
+            if tc.function:
+                entry["function"]["name"] += tc.function.name or ""
+                entry["function"]["arguments"] += tc.function.arguments or ""
+    return "".join(content_parts), [tool_calls[i] for i in sorted(tool_calls)]
+
+
+def _asks_question(chat_history):
+    """True if the last turn is the assistant asking something, so a prompt like "ok" answers it."""
+    return bool(chat_history) and chat_history[-1].get("role") == "assistant" \
+        and chat_history[-1].get("text", "").rstrip().endswith("?")
+
+
+def _replayed_history(prompt, chat_history):
+    """Return the turns before prompt that are replayed to the model with it.
+    
+    That is the last 5 (to avoid context overflow), skipping error messages, unless
+    the prompt is clearly standalone.
+    """
+    if not _asks_question(chat_history) and _STANDALONE.search(prompt) and not _NEEDS_CONTEXT.search(prompt):
+        return []
+    return [turn for turn in chat_history[-5:] if not _is_error_turn(turn)]
+
+
+def _chat_events(prompt, server_names, session_id, chat_history, recent_history, message_count,
+                 tool_history, start_time, now_iso):
+    """Run one chat turn, yielding ('delta' | 'status' | 'done', payload) events.
+    
+    chat_history is the recent window and recent_history the part of it replayed with
+    the prompt; message_count is the stored total chat_history ends at.
+    """
+    answers_question = _asks_question(chat_history)
+    reply_key = _reply_cache_key(session_id, server_names, prompt, recent_history)
     
     # Add user message to history
     user_turn = {
         "role": "user",
         "text": prompt,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso
     }
     
     # Add user message to history
     chat_history.append(user_turn)
-    
-    # Process with LLM chat tool
-    server_name = selected_servers[0]  # Use first selected server
+    new_tools = []  # Tool calls made during this turn, stored with it
     
     try:
-        # Prepare conversation history for context
-        conversation_history = chat_history[-25:]  # Use more history for better follow-ups
+        # Prior results by (tool, args). Calls made during this turn replace their entry
+        # so the response below uses fresh data.
+        tool_index = _build_tool_index(tool_history)
         
         # If OpenAI is configured, use it as a general-purpose LLM with function-calling to MCP tools
         use_openai = bool(os.environ.get('OPENAI_API_KEY')) and OpenAI is not None
-        logger.info(f"OpenAI API Key configured: {bool(os.environ.get('OPENAI_API_KEY'))}, OpenAI available: {OpenAI is not None}, use_openai: {use_openai}")
+        logger.info("OpenAI API Key configured: %s, OpenAI available: %s, use_openai: %s", bool(os.environ.get('OPENAI_API_KEY')), OpenAI is not None, use_openai)
         assistant_response = None
         citations = []
         response_data = None
         
-        if use_openai:
-            logger.info(f"[TIMING] Starting OpenAI processing at {time.time() - start_time:.2f}s")
-            client = OpenAI()
+        trivial = None if answers_question else _TRIVIAL_RE.match(prompt.strip().lower())
+        with _reply_cache_lock:
+            cached_reply = _reply_cache.get(reply_key) if use_openai else None
+        if trivial:
+            assistant_response = _CANNED_REPLIES[trivial.group(1)]
+            logger.info("Answered trivial prompt locally without an OpenAI call")
+        elif cached_reply is not None:
+            assistant_response, citations, response_data = cached_reply
+            citations = list(citations)
+            logger.info("Answered repeated prompt from the reply cache without an OpenAI call")
+        elif use_openai:
+            logger.info("[TIMING] Starting OpenAI processing at %.2fs", time.perf_counter() - start_time)
+            client = _openai_client()
             model = os.environ.get('OPENAI_MODEL', os.environ.get('DEFAULT_MODEL', 'gpt-4o-mini'))
-            system_prompt = (
-                "You are a helpful general-purpose assistant with access to Nautobot network data tools. "
-                "You can call multiple MCP tools in sequence to gather comprehensive information. "
-                "IMPORTANT GUIDELINES: "
-                "1. For complex questions, use multiple tools to gather different types of data (devices, prefixes, circuits, etc.) "
-                "2. You can chain tool calls - use results from one tool to inform subsequent tool calls "
-                "3. Always use conversation history to resolve pronouns and follow-ups "
-                "4. If the user asks to reformat or export 'that' or 'those results', use the most recent relevant results "
-                "5. Use markdown formatting for better readability with proper table syntax "
-                "6. When analyzing network data, consider relationships between devices, prefixes, circuits, and locations "
-                "7. For comprehensive analysis, gather data from multiple sources before providing insights "
-                "8. You can chain tool calls - get devices first, then get their interfaces for detailed analysis "
-                "9. Use exact location codes (e.g., 'BRCN', 'NYDC') - full names will fail "
-                "Available tools: get_prefixes_by_location_enhanced, get_devices_by_location, get_devices_by_location_and_role, get_interfaces_by_device, get_circuits_by_location, get_locations, get_providers, get_circuits_by_provider"
-            )
             # Build conversation history for OpenAI function calling
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Add recent conversation history (last 5 turns to avoid context overflow)
-            recent_history = conversation_history[-5:] if len(conversation_history) > 5 else conversation_history
+            messages = [_SYSTEM_MSG]
+            call_seq = itertools.count(1)
             
             for turn in recent_history:
                 role = turn.get("role", "user")
                 text = turn.get("text", "")
                 
-                # Skip error messages
-                if role == "assistant" and text.startswith("Error processing request:"):
-                    continue
-                
                 # Add user messages directly
                 if role == "user":
                     messages.append({"role": "user", "content": text})
                     continue
                 
                 # For assistant messages, check if they had tool calls
-                if role == "assistant" and turn.get("citations"):
+                citations = turn.get("citations")
+                if role == "assistant" and citations:
                     # Find the corresponding tool result
-                    citations = turn.get("citations", [])
                     if len(citations) == 1:  # Simple case: one tool call
                         citation = citations[0]
                         tool_name = citation.get("tool")
                         tool_args = citation.get("args", {})
                         
                         # Find the tool result
-                        tool_result = None
-                        for tool_entry in tool_history:
-                            if (tool_entry.get('tool') == tool_name and 
-                                tool_entry.get('args') == tool_args):
-                                tool_result = tool_entry.get('result', {})
-                                break
+                        key = _tool_key(tool_name, tool_args)
+                        tool_entry = tool_index.get(key)
+                        tool_result = _tool_result(tool_entry) if tool_entry else None
                         
                         if tool_result:
                             # Add assistant message with tool call
-                            tool_call_id = f"call_{tool_name[:15]}_{abs(hash(json.dumps(tool_args, sort_keys=True))) % 1000:03d}"
+                            tool_call_id = _tool_call_id(tool_name, call_seq)
                             messages.append({
                                 "role": "assistant",
                                 "content": text,
@@ -289,7 +900,7 @@ def chat():
                                     "type": "function",
                                     "function": {
                                         "name": tool_name,
-                                        "arguments": json.dumps(tool_args)
+                                        "arguments": orjson.dumps(tool_args).decode()
                                     }
                                 }]
                             })
@@ -297,7 +908,7 @@ def chat():
                             # Add tool response
                             messages.append({
                                 "role": "tool",
-                                "content": json.dumps(tool_result),
+                                "content": orjson.dumps(_summarize_tool_result(tool_result)).decode(),
                                 "tool_call_id": tool_call_id
                             })
                         else:
@@ -310,71 +921,77 @@ def chat():
                     # Regular assistant message without tool calls
                     messages.append({"role": "assistant", "content": text})
             
-            logger.info(f"Built conversation history with {len(messages)} messages, including {len([m for m in messages if m['role'] == 'tool'])} tool results")
+            logger.info("Built conversation history with %s messages, including %s tool results", len(messages), sum(1 for m in messages if m['role'] == 'tool'))
             
             # Debug: Log what we're sending to OpenAI
-            debug_messages = []
-            for msg in messages:
-                debug_msg = {
-                    "role": msg["role"],
-                    "content_length": len(msg.get("content", ""))
-                }
-                if msg["role"] == "tool":
-                    debug_msg["tool_call_id"] = msg.get("tool_call_id", "unknown")
-                debug_messages.append(debug_msg)
-            logger.info(f"Messages being sent to OpenAI: {json.dumps(debug_messages, indent=2)}")
-            
-            # Debug: Log session state
-            logger.info(f"Session state - chat_history: {len(session.get('chat_history', []))} messages, tool_history: {len(session.get('tool_history', []))} tools")
-            if session.get('tool_history'):
-                logger.info(f"Recent tool history: {[t.get('tool') for t in session.get('tool_history', [])[-3:]]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                debug_messages = []
+                for msg in messages:
+                    debug_msg = {
+                        "role": msg["role"],
+                        "content_length": len(msg.get("content") or "")
+                    }
+                    if msg["role"] == "tool":
+                        debug_msg["tool_call_id"] = msg.get("tool_call_id", "unknown")
+                    debug_messages.append(debug_msg)
+                logger.debug("Messages being sent to OpenAI: %s", orjson.dumps(debug_messages, option=orjson.OPT_INDENT_2).decode())
             
             messages.append({"role": "user", "content": prompt})
-            # Dynamically discover tools from MCP server
-            tools = discover_tools_from_mcp_server(server_name)
+            # Dynamically discover tools from the selected MCP servers
+            tools, tool_routes = _discover_tools(server_names)
             if not tools:
                 logger.warning("No tools discovered from MCP server, using empty tools list")
-            logger.info(f"[TIMING] Making first OpenAI API call at {time.time() - start_time:.2f}s")
-            first = client.chat.completions.create(
+            logger.info("[TIMING] Making first OpenAI API call at %.2fs", time.perf_counter() - start_time)
+            content, tool_calls = yield from _stream_completion(
+                client,
                 model=model,
                 messages=messages,
                 tools=tools,
                 tool_choice="auto",
             )
-            logger.info(f"[TIMING] First OpenAI API call completed at {time.time() - start_time:.2f}s")
-            choice = first.choices[0]
-            msg = choice.message
-            logger.info(f"OpenAI response - has tool calls: {bool(msg.tool_calls)}, content: {msg.content[:100] if msg.content else 'None'}")
+            logger.info("[TIMING] First OpenAI API call completed at %.2fs", time.perf_counter() - start_time)
+            logger.info("OpenAI response - has tool calls: %s, content: %.100s", bool(tool_calls), content or 'None')
             
             # Initialize assistant_response variable
             assistant_response = None
             citations = []
             
-            if msg.tool_calls:
-                messages.append({"role": "assistant", "content": msg.content or "", "tool_calls": [tc.model_dump() for tc in msg.tool_calls]})
-                logger.info(f"[TIMING] Processing {len(msg.tool_calls)} tool calls at {time.time() - start_time:.2f}s")
+            if tool_calls:
+                messages.append({"role": "assistant", "content": content, "tool_calls": tool_calls})
+                logger.info("[TIMING] Processing %s tool calls at %.2fs", len(tool_calls), time.perf_counter() - start_time)
                 
                 # Enhanced multi-tool processing with chaining support
                 tool_call_round = 1
                 max_tool_rounds = 5  # Prevent infinite loops
                 
-                while msg.tool_calls and tool_call_round <= max_tool_rounds:
-                    logger.info(f"[TIMING] Starting tool call round {tool_call_round} with {len(msg.tool_calls)} tools at {time.time() - start_time:.2f}s")
+                while tool_calls and tool_call_round <= max_tool_rounds:
+                    logger.info("[TIMING] Starting tool call round %s with %s tools at %.2fs", tool_call_round, len(tool_calls), time.perf_counter() - start_time)
                     
-                    # Process all tool calls in this round
-                    for i, tc in enumerate(msg.tool_calls):
-                        fn = tc.function
-                        name = fn.name
-                        logger.info(f"[TIMING] Round {tool_call_round}, Tool {i+1}/{len(msg.tool_calls)}: '{name}' at {time.time() - start_time:.2f}s")
+                    # Parse every call in this round, then run them concurrently
+                    round_calls = []
+                    for i, tc in enumerate(tool_calls):
+                        fn = tc["function"]
+                        name = fn["name"]
+                        logger.info("[TIMING] Round %s, Tool %s/%s: '%s' at %.2fs", tool_call_round, i+1, len(tool_calls), name, time.perf_counter() - start_time)
                         
                         try:
-                            args = json.loads(fn.arguments or '{}')
+                            args = orjson.loads(fn["arguments"] or '{}')
                         except Exception as e:
-                            logger.error(f"Failed to parse arguments for tool {name}: {e}")
+                            logger.error("Failed to parse arguments for tool %s: %s", name, e)
                             args = {}
-                        
-                        # Enhanced tool execution with detailed logging
-                        api_result = execute_tool_with_status(name, args, server_name, start_time, tool_call_round, i+1, len(msg.tool_calls))
+                        round_calls.append((tc, name, args))
+                    
+                    yield 'status', {'status': f"Running {', '.join(name for _, name, _ in round_calls)} (round {tool_call_round})"}
+                    
+                    # Enhanced tool execution with detailed logging
+                    futures = [
+                        _TOOL_POOL.submit(execute_tool_with_status, name, args, tool_routes.get(name, server_names[0]), start_time, tool_call_round, i+1, len(round_calls))
+                        for i, (tc, name, args) in enumerate(round_calls)
+                    ]
+                    
+                    # Collect results in call order so tool messages follow their tool_call_ids
+                    for i, ((tc, name, args), future) in enumerate(zip(round_calls, futures)):
+                        api_result = future.result()
                         
                         # Store tool call and result for future reference
                         tool_result = api_result.get('result', api_result)
@@ -383,93 +1000,94 @@ def chat():
                             "tool": name,
                             "args": args,
                             "result": tool_result,
-                            "timestamp": datetime.now().isoformat(),
+                            "timestamp": now_iso,
                             "round": tool_call_round,
                             "tool_index": i+1
                         }
                         tool_history.append(persisted)
+                        tool_index[_tool_key(name, args)] = persisted
+                        new_tools.append(persisted)
                         citations.append({"tool": name, "args": args, "round": tool_call_round})
                         
                         # Add tool result to messages for this conversation turn
                         messages.append({
                             "role": "tool", 
-                            "tool_call_id": tc.id, 
-                            "content": json.dumps(tool_result)
+                            "tool_call_id": tc["id"], 
+                            "content": orjson.dumps(_summarize_tool_result(tool_result)).decode()
                         })
                     
                     # Check if we need another round of tool calls
                     if tool_call_round < max_tool_rounds:
-                        logger.info(f"[TIMING] Making follow-up OpenAI API call for round {tool_call_round} at {time.time() - start_time:.2f}s")
-                        follow_up = client.chat.completions.create(
+                        logger.info("[TIMING] Making follow-up OpenAI API call for round %s at %.2fs", tool_call_round, time.perf_counter() - start_time)
+                        yield 'status', {'status': 'Generating response...'}
+                        content, tool_calls = yield from _stream_completion(
+                            client,
                             model=model, 
                             messages=messages,
                             tools=tools,
                             tool_choice="auto"
                         )
-                        msg = follow_up.choices[0].message
-                        logger.info(f"[TIMING] Follow-up OpenAI API call completed for round {tool_call_round} at {time.time() - start_time:.2f}s")
-                        logger.info(f"Follow-up response - has tool calls: {bool(msg.tool_calls)}, content: {msg.content[:100] if msg.content else 'None'}")
+                        logger.info("[TIMING] Follow-up OpenAI API call completed for round %s at %.2fs", tool_call_round, time.perf_counter() - start_time)
+                        logger.info("Follow-up response - has tool calls: %s, content: %.100s", bool(tool_calls), content or 'None')
                         
-                        if msg.tool_calls:
-                            messages.append({"role": "assistant", "content": msg.content or "", "tool_calls": [tc.model_dump() for tc in msg.tool_calls]})
+                        if tool_calls:
+                            messages.append({"role": "assistant", "content": content, "tool_calls": tool_calls})
                             tool_call_round += 1
                         else:
                             # No more tool calls needed
-                            assistant_response = msg.content or ""
+                            assistant_response = content
                             break
                     else:
                         # Max rounds reached, get final response
-                        logger.info(f"[TIMING] Max tool call rounds ({max_tool_rounds}) reached, getting final response at {time.time() - start_time:.2f}s")
-                        final_response = client.chat.completions.create(model=model, messages=messages)
-                        assistant_response = final_response.choices[0].message.content or ""
+                        logger.info("[TIMING] Max tool call rounds (%s) reached, getting final response at %.2fs", max_tool_rounds, time.perf_counter() - start_time)
+                        yield 'status', {'status': 'Generating response...'}
+                        assistant_response, _ = yield from _stream_completion(client, model=model, messages=messages)
                         break
                 
                 # If we didn't get a response yet, get the final one
                 if not assistant_response:
-                    logger.info(f"[TIMING] Making final OpenAI API call at {time.time() - start_time:.2f}s")
-                    final = client.chat.completions.create(model=model, messages=messages)
-                    assistant_response = final.choices[0].message.content or ""
-                    logger.info(f"[TIMING] Final OpenAI API call completed at {time.time() - start_time:.2f}s")
+                    logger.info("[TIMING] Making final OpenAI API call at %.2fs", time.perf_counter() - start_time)
+                    yield 'status', {'status': 'Generating response...'}
+                    assistant_response, _ = yield from _stream_completion(client, model=model, messages=messages)
+                    logger.info("[TIMING] Final OpenAI API call completed at %.2fs", time.perf_counter() - start_time)
                 
-                logger.info(f"Multi-tool processing completed - final response: {assistant_response[:100] if assistant_response else 'None'}")
+                logger.info("Multi-tool processing completed - final response: %.100s", assistant_response or 'None')
             else:
                 # No tool calls made - use the assistant's direct response
-                assistant_response = msg.content or "I don't have any specific tools to help with that request. Please try asking about network devices, prefixes, or locations using the available tools."
+                assistant_response = content or "I don't have any specific tools to help with that request. Please try asking about network devices, prefixes, or locations using the available tools."
                 citations = []
-                logger.info(f"No tool calls - using direct response: {assistant_response[:100] if assistant_response else 'None'}")
+                logger.info("No tool calls - using direct response: %.100s", assistant_response or 'None')
         
         # Check if the LLM requested any specific format and prepare response data
-        response_data = None
-        if citations:
+        if citations and cached_reply is None:
             for citation in citations:
                 if citation.get("tool") == "get_prefixes_by_location_enhanced":
-                    format_type = citation.get("args", {}).get("format", "json")
+                    citation_args = citation.get("args", {})
+                    format_type = citation_args.get("format", "json")
                     # Only make additional API calls if the LLM specifically requested a different format
                     if format_type in ["csv", "table", "dataframe"]:
                         # Find the tool result from our history to avoid redundant API calls
-                        location_name = citation.get("args", {}).get("location_name", "")
-                        for tool_entry in tool_history:
-                            if (tool_entry.get('tool') == 'get_prefixes_by_location_enhanced' and 
-                                tool_entry.get('args', {}).get('location_name') == location_name):
-                                # Use the existing result instead of making a new API call
-                                tool_result = tool_entry.get('result', {})
-                                if format_type == "csv" and tool_result.get("success"):
+                        tool_entry = tool_index.get(_tool_key("get_prefixes_by_location_enhanced", citation_args))
+                        if tool_entry:
+                            # Use the existing result instead of making a new API call
+                            tool_result = _tool_result(tool_entry)
+                            if tool_result.get("success"):
+                                if format_type == "csv":
                                     response_data = {
                                         "format": "csv",
                                         "data": tool_result.get("data", []),
                                         "message": "Data available for CSV export"
                                     }
-                                elif format_type == "table" and tool_result.get("success"):
+                                elif format_type == "table":
                                     response_data = {
                                         "format": "table", 
                                         "data": tool_result.get("data", [])
                                     }
-                                elif format_type == "dataframe" and tool_result.get("success"):
+                                else:
                                     response_data = {
                                         "format": "dataframe",
                                         "analysis": tool_result.get("summary", {})
                                     }
-                                break
                         break
         
         # Ensure assistant_response is not None
@@ -480,116 +1098,138 @@ def chat():
             else:
                 assistant_response = "I apologize, but I encountered an issue processing your request. Please try again."
                 logger.warning("assistant_response was None, using fallback message")
+        elif use_openai and not trivial and cached_reply is None and not any(_tool_failed(t["result"]) for t in new_tools):
+            # Answers written around a failed tool call are not cached, so retrying calls it again
+            with _reply_cache_lock:
+                _reply_cache[reply_key] = (assistant_response, citations, response_data)
         
         # Add assistant response to history
         assistant_turn = {
             "role": "assistant",
             "text": assistant_response,
             "citations": citations,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso
         }
         chat_history.append(assistant_turn)
+        turns = [user_turn, assistant_turn]
         
-        # Persist conversation data to MongoDB
+        # Persist conversation data to MongoDB; only this turn's messages and tool calls are appended
         try:
-            conversations_col.update_one(
-                {'session_id': session_id}, 
-                {
-                    '$set': {
-                        'messages': chat_history,
-                        'tools': tool_history
-                    }
-                }
-            )
+            _save_turn(session_id, turns, new_tools, now_iso)
         except Exception as e:
-            logger.error(f"Failed to persist conversation data: {e}")
+            logger.error("Failed to persist conversation data: %s", e)
+            _forget_conversation(session_id)
         
-        total_time = time.time() - start_time
-        logger.info(f"[TIMING] Total request completed in {total_time:.2f}s")
+        total_time = time.perf_counter() - start_time
+        logger.info("[TIMING] Total request completed in %.2fs", total_time)
         
-        return jsonify({
+        yield 'done', {
             'success': True,
             'response': assistant_response,
             'citations': citations,
             'data': response_data,
-            'chat_history': chat_history,
-            'context_history': [],
+            'turn': assistant_turn,
+            'seq': message_count + len(turns),
             'timing': {
                 'total_time': total_time
             }
-        })
+        }
         
     except Exception as e:
-        error_response = f"Error processing request: {str(e)}"
+        error_response = f"{_ERR_PREFIX} {str(e)}"
         
         # Add error to history
         error_turn = {
             "role": "assistant",
             "text": error_response,
             "citations": [],
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso
         }
         chat_history.append(error_turn)
+        turns = [user_turn, error_turn]
         
         # Persist error to MongoDB
         try:
-            conversations_col.update_one(
-                {'session_id': session_id}, 
-                {
-                    '$set': {
-                        'messages': chat_history,
-                        'tools': tool_history
-                    }
-                }
-            )
+            _save_turn(session_id, turns, new_tools, now_iso)
         except Exception as persist_error:
-            logger.error(f"Failed to persist error: {persist_error}")
+            logger.error("Failed to persist error: %s", persist_error)
+            _forget_conversation(session_id)
         
-        total_time = time.time() - start_time
-        logger.info(f"[TIMING] Request failed after {total_time:.2f}s")
+        total_time = time.perf_counter() - start_time
+        logger.info("[TIMING] Request failed after %.2fs", total_time)
         
-        return jsonify({
+        yield 'done', {
             'success': False,
             'error': error_response,
-            'chat_history': chat_history,
-            'context_history': [],
+            'turn': error_turn,
+            'seq': message_count + len(turns),
             'timing': {
                 'total_time': total_time
             }
-        })
+        }
 
 
 @app.route('/api/export/<format>')
 def export(format):
-    """Export chat history."""
+    """Queue an export of the chat history and return a job id to poll."""
     # Get session ID from request
     session_id = request.cookies.get('session_id')
     if not session_id:
         return jsonify({'success': False, 'error': 'No session ID found'})
     
-    # Get conversation for this session
-    conv_doc = conversations_col.find_one({'session_id': session_id})
-    if not conv_doc:
-        return jsonify({'success': False, 'error': 'No conversation found for session'})
+    if format not in _EXPORTERS:
+        return jsonify({'success': False, 'error': 'Invalid export format'})
     
-    chat_history = conv_doc.get('messages', [])
+    job_id = uuid.uuid4().hex
+    export_jobs_col.insert_one({
+        '_id': job_id,
+        'session_id': session_id,
+        'format': format,
+        'status': 'queued',
+        'created_at': datetime.now(timezone.utc)
+    })
+    _EXPORT_POOL.submit(_run_export, job_id, session_id, format)
     
-    if format == 'json':
-        try:
-            filepath = export_json(chat_history)
-            return jsonify({'success': True, 'filepath': filepath})
-        except Exception as e:
-            return jsonify({'success': False, 'error': str(e)})
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'})
+
+
+def _run_export(job_id, session_id, format):
+    """Write an export file in the background and record the outcome on the job."""
+    try:
+        conv_doc = conversations_col.find_one({'session_id': session_id}, {'messages': 1, 'rolled_over': 1, 'cleared_at': 1})
+        if not conv_doc:
+            raise ValueError('No conversation found for session')
+        
+        # Messages rolled over out of the conversation doc come first; the doc is read
+        # first so a rollover landing in between can't duplicate or drop any
+        _, messages = _rolled_over_messages(session_id, conv_doc)
+        filepath = _EXPORTERS[format](messages + conv_doc.get('messages', []))
+        update = {'status': 'finished', 'filepath': filepath}
+    except Exception as e:
+        logger.error("Export job %s failed: %s", job_id, e)
+        update = {'status': 'failed', 'error': str(e)}
     
-    elif format == 'markdown':
-        try:
-            filepath = export_markdown(chat_history)
-            return jsonify({'success': True, 'filepath': filepath})
-        except Exception as e:
-            return jsonify({'success': False, 'error': str(e)})
+    update['finished_at'] = datetime.now(timezone.utc)
+    export_jobs_col.update_one({'_id': job_id}, {'$set': update})
+
+
+@app.route('/api/export/status/<job_id>')
+def export_status(job_id):
+    """Report the state of a queued export."""
+    session_id = request.cookies.get('session_id')
+    if not session_id:
+        return jsonify({'success': False, 'error': 'No session ID found'})
     
-    else:
-        return jsonify({'success': False, 'error': 'Invalid export format'})
+    job = export_jobs_col.find_one({'_id': job_id, 'session_id': session_id})
+    if not job:
+        return jsonify({'success': False, 'error': 'Export job not found'})
+    
+    return jsonify({
+        'success': job['status'] != 'failed',
+        'status': job['status'],
+        'filepath': job.get('filepath'),
+        'error': job.get('error')
+    })
 
 
 @app.route('/api/clear')
@@ -600,36 +1240,107 @@ def clear_chat():
     if not session_id:
         return jsonify({'success': False, 'error': 'No session ID found'})
     
-    # Archive the current conversation before clearing
-    conv_doc = conversations_col.find_one({'session_id': session_id})
-    if conv_doc and conv_doc.get('messages'):
-        # Create archive entry
-        archive_entry = {
-            'session_id': session_id,
-            'archived_at': datetime.now().isoformat(),
-            'messages': conv_doc.get('messages', []),
-            'tools': conv_doc.get('tools', []),
-            'title': _generate_conversation_title(conv_doc.get('messages', [])),
-            'message_count': len(conv_doc.get('messages', [])),
-            'first_message': conv_doc.get('messages', [{}])[0].get('text', '') if conv_doc.get('messages') else ''
-        }
-        mongo_db.get_collection('conversation_archives').insert_one(archive_entry)
+    cleared_at = datetime.now(timezone.utc)
+    now_iso = cleared_at.isoformat()
     
-    # Clear conversation data
-    conversations_col.update_one(
+    # Clear conversation data, taking the cleared messages in the same round trip
+    conv_doc = conversations_col.find_one_and_update(
         {'session_id': session_id}, 
         {
             '$set': {
                 'messages': [],
-                'tools': [],
-                'updated_at': datetime.now().isoformat()
+                'rolled_over': 0,
+                'cleared_at': cleared_at,
+                'updated_at': now_iso
             }
-        }
+        },
+        projection={'messages': 1, 'rolled_over': 1, 'cleared_at': 1},
+        return_document=ReturnDocument.BEFORE
     )
+    _forget_conversation(session_id)
     
+    # Archive what was cleared and drop its tool calls in the background
+    _ARCHIVE_POOL.submit(_archive_cleared, session_id, conv_doc or {}, now_iso, cleared_at)
+
     return jsonify({'success': True})
 
 
+def _archive_cleared(session_id, conv_doc, archived_at, cleared_at):
+    """Archive a cleared conversation doc, then delete the tool calls made before the clear.
+    
+    Tool calls from turns taken after the clear are left alone.
+    """
+    try:
+        _archive_conversation(session_id, conv_doc, archived_at, tools_until=cleared_at)
+        tools_col.delete_many({'session_id': session_id, 'created_at': {'$lte': cleared_at}})
+        _forget_conversation(session_id)
+    except Exception as e:
+        logger.error("Failed to archive cleared conversation %s: %s", session_id, e)
+
+
+def _archive_conversation(session_id, conv_doc, archived_at, tools_until=None):
+    """Archive a conversation doc's messages and the session's tool calls.
+    
+    conv_doc holds messages, rolled_over and cleared_at. Messages rolled over out of
+    it are put back in front and their chunks dropped. With tools_until, only tool
+    calls stored at or before that UTC datetime are included.
+    The body is written before the metadata so a listed archive always has one.
+    """
+    rolled_ids, rolled = _rolled_over_messages(session_id, conv_doc)
+    messages = rolled + (conv_doc.get('messages') or [])
+    if not messages:
+        return
+    archive_id = ObjectId()
+    archive_messages_col.insert_one({
+        '_id': archive_id,
+        'session_id': session_id,
+        'messages': messages,
+        'tools': _session_tools(session_id, until=tools_until)
+    })
+    archives_col.insert_one({
+        '_id': archive_id,
+        'session_id': session_id,
+        'archived_at': archived_at,
+        'title': _generate_conversation_title(messages),
+        'message_count': len(messages),
+        'first_message': messages[0].get('text', '')
+    })
+    if rolled_ids:
+        archive_messages_col.delete_many({'_id': {'$in': rolled_ids}})
+    _archives_changed(session_id)
+
+
+def _rolled_over_messages(session_id, conv_doc):
+    """Return (chunk ids, messages) rolled over out of conv_doc, oldest first.
+    
+    conv_doc must be read before the chunks. Only messages before its rolled_over
+    count are taken, so chunks from a rollover that landed later (or never completed)
+    are ignored, as are chunks from before its last clear.
+    """
+    rolled_over = conv_doc.get('rolled_over') or 0
+    if not rolled_over:
+        return [], []
+    query = {'session_id': session_id, 'offset': {'$lt': rolled_over}}
+    if conv_doc.get('cleared_at') is not None:
+        query['rolled_over_at'] = {'$gt': conv_doc['cleared_at']}
+    ids, by_index = [], {}
+    for chunk in archive_messages_col.find(query, {'messages': 1, 'offset': 1}).sort([('offset', 1), ('_id', 1)]):
+        ids.append(chunk['_id'])
+        for i, message in enumerate(chunk.get('messages') or [], chunk['offset']):
+            if i < rolled_over:
+                by_index.setdefault(i, message)
+    return ids, [by_index[i] for i in sorted(by_index)]
+
+
+def _archive_session(session_id, archived_at):
+    """Archive a session's conversation if it has messages, logging rather than raising on failure."""
+    try:
+        conv_doc = conversations_col.find_one({'session_id': session_id}, {'messages': 1, 'rolled_over': 1, 'cleared_at': 1})
+        _archive_conversation(session_id, conv_doc or {}, archived_at)
+    except Exception as e:
+        logger.error("Failed to archive conversation %s: %s", session_id, e)
+
+
 def _generate_conversation_title(messages):
     """Generate a title for the conversation based on the first user message."""
     if not messages:
@@ -654,8 +1365,16 @@ def get_chat_history():
     if not session_id:
         return jsonify({'error': 'No session ID found'})
     
+    # Serve the encoded list from the worker cache until an archive is added or deleted
+    version = get_version(f'archives:ver:{session_id}')
+    key = (session_id, version)
+    with _archive_list_lock:
+        body = _archive_list_cache.get(key) if version is not None else None
+    if body is not None:
+        return _conditional_body(body)
+    
     # Get archived conversations for this session
-    archives = list(mongo_db.get_collection('conversation_archives').find(
+    cursor = archives_col.find(
         {'session_id': session_id},
         {
             'archived_at': 1,
@@ -664,13 +1383,18 @@ def get_chat_history():
             'first_message': 1,
             '_id': 1
         }
-    ).sort('archived_at', -1).limit(20))  # Last 20 conversations
-    
-    # Convert ObjectId to string for JSON serialization
-    for archive in archives:
-        archive['_id'] = str(archive['_id'])
+    ).sort('archived_at', -1).limit(20)  # Last 20 conversations
     
-    return jsonify({'archives': archives})
+    body = orjson.dumps({'archives': list(cursor)}, default=_json_default)
+    if version is not None:
+        with _archive_list_lock:
+            _archive_list_cache[key] = body
+    return _conditional_body(body)
+
+
+def _archives_changed(session_id):
+    """Invalidate a session's cached archive list in every worker."""
+    bump_version(f'archives:ver:{session_id}')
 
 
 @app.route('/api/chat-history/<archive_id>', methods=['GET'])
@@ -684,17 +1408,26 @@ def get_archived_conversation(archive_id):
         # Convert string to ObjectId
         obj_id = ObjectId(archive_id)
         
+        # Optional ?offset=&limit= pages through the messages in MongoDB; message_count gives the total
+        page = None
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            offset = request.args.get('offset', 0, type=int)
+            page = {'messages': {'$slice': [max(offset, 0), max(limit, 1)]}}
+        
         # Get the archived conversation
-        archive = mongo_db.get_collection('conversation_archives').find_one({
+        archive = archives_col.find_one({
             '_id': obj_id,
             'session_id': session_id
-        })
+        }, page)
         
         if not archive:
             return jsonify({'error': 'Archive not found'})
         
-        # Convert ObjectId to string
-        archive['_id'] = str(archive['_id'])
+        # Archives written before bodies were split out still embed their messages
+        body = archive_messages_col.find_one({'_id': obj_id}, {'_id': 0, 'session_id': 0, **(page or {})})
+        if body:
+            archive.update(body)
         
         return jsonify({'archive': archive})
     except Exception as e:
@@ -713,13 +1446,15 @@ def delete_archived_conversation(archive_id):
         obj_id = ObjectId(archive_id)
         
         # Delete the archived conversation
-        result = mongo_db.get_collection('conversation_archives').delete_one({
+        result = archives_col.delete_one({
             '_id': obj_id,
             'session_id': session_id
         })
         
         if result.deleted_count == 0:
             return jsonify({'error': 'Archive not found'})
+        archive_messages_col.delete_one({'_id': obj_id, 'session_id': session_id})
+        _archives_changed(session_id)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -733,81 +1468,94 @@ def new_chat():
     if not session_id:
         return jsonify({'error': 'No session ID found'})
     
-    # Archive current conversation if it has messages
-    conv_doc = conversations_col.find_one({'session_id': session_id})
-    if conv_doc and conv_doc.get('messages'):
-        archive_entry = {
-            'session_id': session_id,
-            'archived_at': datetime.now().isoformat(),
-            'messages': conv_doc.get('messages', []),
-            'tools': conv_doc.get('tools', []),
-            'title': _generate_conversation_title(conv_doc.get('messages', [])),
-            'message_count': len(conv_doc.get('messages', [])),
-            'first_message': conv_doc.get('messages', [{}])[0].get('text', '') if conv_doc.get('messages') else ''
-        }
-        mongo_db.get_collection('conversation_archives').insert_one(archive_entry)
+    now = datetime.now(timezone.utc)
+    
+    # Archive current conversation if it has messages; the old session is not written to again
+    _ARCHIVE_POOL.submit(_archive_session, session_id, now.isoformat())
     
     # Create new conversation
-    new_session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
-    new_conv = {
-        'session_id': new_session_id,
-        'created_at': datetime.now().isoformat(),
-        'messages': [],
-        'tools': []
-    }
-    conversations_col.insert_one(new_conv)
+    new_session_id = f"session_{now.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+    conversations_col.update_one(
+        {'session_id': new_session_id},
+        {'$setOnInsert': {'created_at': now.isoformat(), 'messages': []}},
+        upsert=True
+    )
     
     response = jsonify({'success': True, 'new_session_id': new_session_id})
     response.set_cookie('session_id', new_session_id, max_age=3600)
     return response
 
 
+def _summarize_message(msg):
+    """Condense a stored message for the context panel, truncating long text."""
+    text = msg.get("text") or ""
+    return {
+        "role": msg.get("role", "unknown"),
+        "text": text[:200] + "..." if len(text) > 200 else text,
+        "citations": msg.get("citations", [])
+    }
+
+
+# Messages of raw history included in /api/context alongside the summaries
+CONTEXT_CHAT_TAIL = 20
+
+
 @app.route('/api/context')
+@cached_response
 def get_context():
     """Get current context windows and conversation history."""
-    context_windows = get_context_windows()
-    
     # Get session ID from request
     session_id = request.cookies.get('session_id')
     if not session_id:
         return jsonify({'error': 'No session ID found'})
     
+    # A context-window refresh goes to every MCP server; let it overlap the MongoDB reads
+    windows_future = _DISCOVER_POOL.submit(
+        cached, 'mcp:context_windows', CATALOG_CACHE_TTL, get_context_windows, _all_servers_ok
+    )
+    
     # Get conversation for this session
-    conv_doc = conversations_col.find_one({'session_id': session_id})
+    conv_doc = _get_conversation(session_id)
     if not conv_doc:
         return jsonify({'error': 'No conversation found for session'})
     
     chat_history = conv_doc.get('messages', [])
-    tool_history = conv_doc.get('tools', [])
+    context_windows = windows_future.result()
+    recent_msgs = chat_history[-10:]
     
-    # Build a more detailed context for display
+    # Build a more detailed context for display; the full transcript is served by the page itself
     detailed_context = {
         'context_windows': context_windows,
-        'chat_history': chat_history,
+        'chat_history': chat_history[-CONTEXT_CHAT_TAIL:],
         'context_history': [],
-        'tool_history': tool_history,
-        'recent_tools': tool_history[-5:] if tool_history else [],  # Last 5 tool calls
-        'conversation_summary': [
-            {
-                "role": msg.get("role", "unknown"),
-                "text": (msg.get("text") or "")[:200] + "..." if len(msg.get("text") or "") > 200 else (msg.get("text") or ""),
-                "citations": msg.get("citations", [])
-            }
-            for msg in chat_history[-10:]  # Last 10 messages
-        ]
+        'conversation_summary': [_summarize_message(msg) for msg in recent_msgs]  # Last 10 messages
     }
     
-    return jsonify(detailed_context)
+    return _conditional_json(detailed_context)
 
 
 @app.route('/api/history')
 def get_history():
-    """Get API call history."""
+    """Get API call history made by this worker process."""
     api_history = get_api_call_history()
-    return jsonify(api_history)
+    return _conditional_json(api_history)
+
+
+# /api/debug replays session state straight from MongoDB; it is only routed when set to 1
+ENABLE_DEBUG_ENDPOINTS = os.environ.get('ENABLE_DEBUG_ENDPOINTS') == '1'
+# Tool results replayed by /api/debug are cut to this many encoded bytes
+DEBUG_TOOL_RESULT_MAX = 16_384
+
 
+def _truncate(obj, max_bytes=DEBUG_TOOL_RESULT_MAX):
+    """Return obj as JSON text, or a marked preview of its first max_bytes if it encodes larger."""
+    data = orjson.dumps(obj)
+    if len(data) > max_bytes:
+        data = orjson.dumps({'_truncated': True, 'preview': data[:max_bytes].decode('utf-8', 'replace')})
+    return data.decode()
 
-@app.route('/api/debug')
+
+@cached_response
 def debug_session():
     """Debug endpoint to see session state."""
     try:
@@ -816,49 +1564,59 @@ def debug_session():
         if not session_id:
             return jsonify({'error': 'No session ID found'})
         
-        # Get conversation for this session
-        conv_doc = conversations_col.find_one({'session_id': session_id})
-        if not conv_doc:
+        # Get the tail of the conversation for this session
+        tail = _conversation_tail(session_id, 5)
+        if tail is None:
             return jsonify({'error': 'No conversation found for session'})
+        conversation_history, message_count = tail
+        if not conversation_history:
+            # New or just-cleared session: nothing to replay and no tool calls kept
+            return jsonify({
+                'session_id': session_id,
+                'chat_history_length': 0,
+                'tool_history_length': 0,
+                'mongo_conv_messages': 0,
+                'mongo_conv_tools': 0,
+                'recent_tool_history': [],
+                'conversation_messages': [],
+                'chat_history': []
+            })
         
         # Build the conversation history that would be sent to OpenAI
-        conversation_history = conv_doc.get('messages', [])[-5:]
+        tool_history = _session_tools(session_id, limit=3)
+        tool_count = tools_col.count_documents({'session_id': session_id})
+        # Each replayed message is encoded as soon as it is built and spliced into the response as-is
         messages = []
+        call_seq = itertools.count(1)
         
-        for turn in conversation_history:
+        # Skip error messages
+        for turn in [turn for turn in conversation_history if not _is_error_turn(turn)]:
             role = turn.get("role", "user")
             text = turn.get("text", "")
             
-            # Skip error messages
-            if role == "assistant" and text.startswith("Error processing request:"):
-                continue
-            
             # Add user messages directly
             if role == "user":
-                messages.append({"role": "user", "content": text})
+                messages.append(orjson.dumps({"role": "user", "content": text}))
                 continue
             
             # For assistant messages, check if they had tool calls
-            if role == "assistant" and turn.get("citations"):
+            citations = turn.get("citations")
+            if role == "assistant" and citations:
                 # Find the corresponding tool result
-                citations = turn.get("citations", [])
                 if len(citations) == 1:  # Simple case: one tool call
                     citation = citations[0]
                     tool_name = citation.get("tool")
                     tool_args = citation.get("args", {})
                     
                     # Find the tool result
-                    tool_result = None
-                    for tool_entry in conv_doc.get('tools', []):
-                        if (tool_entry.get('tool') == tool_name and 
-                            tool_entry.get('args') == tool_args):
-                            tool_result = tool_entry.get('result', {})
-                            break
+                    key = _tool_key(tool_name, tool_args)
+                    tool_entry = _find_tool(session_id, key)
+                    tool_result = _tool_result(tool_entry) if tool_entry else None
                     
                     if tool_result:
                         # Add assistant message with tool call
-                        tool_call_id = f"call_{tool_name[:15]}_{abs(hash(json.dumps(tool_args, sort_keys=True))) % 1000:03d}"
-                        messages.append({
+                        tool_call_id = _tool_call_id(tool_name, call_seq)
+                        messages.append(orjson.dumps({
                             "role": "assistant",
                             "content": text,
                             "tool_calls": [{
@@ -866,64 +1624,60 @@ def debug_session():
                                 "type": "function",
                                 "function": {
                                     "name": tool_name,
-                                    "arguments": json.dumps(tool_args)
+                                    "arguments": orjson.dumps(tool_args).decode()
                                 }
                             }]
-                        })
+                        }))
                         
                         # Add tool response
-                        messages.append({
+                        messages.append(orjson.dumps({
                             "role": "tool",
-                            "content": json.dumps(tool_result),
+                            "content": _truncate(tool_result),
                             "tool_call_id": tool_call_id
-                        })
+                        }))
                     else:
                         # No tool result found, add as regular assistant message
-                        messages.append({"role": "assistant", "content": text})
+                        messages.append(orjson.dumps({"role": "assistant", "content": text}))
                 else:
                     # Multiple tool calls - add as regular assistant message for now
-                    messages.append({"role": "assistant", "content": text})
+                    messages.append(orjson.dumps({"role": "assistant", "content": text}))
             else:
                 # Regular assistant message without tool calls
-                messages.append({"role": "assistant", "content": text})
+                messages.append(orjson.dumps({"role": "assistant", "content": text}))
         
         debug_info = {
             'session_id': session_id,
-            'chat_history_length': len(conv_doc.get('messages', [])),
-            'tool_history_length': len(conv_doc.get('tools', [])),
-            'mongo_conv_messages': len(conv_doc.get('messages', [])),
-            'mongo_conv_tools': len(conv_doc.get('tools', [])),
-            'recent_tool_history': conv_doc.get('tools', [])[-3:],
-            'conversation_messages': messages,
-            'chat_history': conv_doc.get('messages', [])[-5:]  # Last 5 messages
+            'chat_history_length': message_count,
+            'tool_history_length': tool_count,
+            'mongo_conv_messages': message_count,
+            'mongo_conv_tools': tool_count,
+            'recent_tool_history': tool_history,
+            'conversation_messages': orjson.Fragment(b'[' + b','.join(messages) + b']'),
+            'chat_history': conversation_history  # Last 5 messages
         }
         return jsonify(debug_info)
     except Exception as e:
         return jsonify({'error': str(e)})
 
 
+# Left unregistered otherwise, so requests 404 without reaching the handler
+if ENABLE_DEBUG_ENDPOINTS:
+    app.route('/api/debug')(debug_session)
+
+
+# prefixes_<location>[_YYYYMMDD[_...]].csv; the location runs up to the timestamp, if any
+_PREFIX_CSV_RE = re.compile(r'^prefixes_(.+?)(?:_\d{8}(?:_.*)?)?\.csv$')
+
+
 @app.route('/api/export/csv/<filename>')
 def download_csv(filename):
     """Download CSV file."""
     try:
         # Extract location name from filename (handle timestamped filenames)
         # Example: prefixes_branch_office_3_20250819_055826.csv -> Branch Office 3
-        if filename.startswith('prefixes_'):
-            # Remove 'prefixes_' prefix and '.csv' suffix
-            name_part = filename[9:].replace('.csv', '')
-            
-            # Split by underscores and handle timestamp
-            parts = name_part.split('_')
-            
-            # Find where the timestamp starts (YYYYMMDD pattern)
-            location_parts = []
-            for part in parts:
-                if len(part) == 8 and part.isdigit():  # Timestamp found
-                    break
-                location_parts.append(part)
-            
-            # Reconstruct location name
-            location_name = ' '.join(location_parts).title()
+        match = _PREFIX_CSV_RE.match(filename)
+        if match:
+            location_name = match.group(1).replace('_', ' ').title()
         else:
             location_name = filename.replace('.csv', '').replace('_', ' ')
         
@@ -933,18 +1687,12 @@ def download_csv(filename):
             "filename": filename
         })
         
-        if result.get("success") and result.get("data"):
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-                f.write(result["data"])
-                temp_path = f.name
-            
-            return send_file(
-                temp_path,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='text/csv'
-            )
+        csv_data = result.get("data")
+        if csv_data and result.get("success"):
+            # The CSV is already in memory; send it as-is rather than via a temp file
+            response = Response(csv_data, mimetype='text/csv')
+            response.headers.set('Content-Disposition', 'attachment', filename=filename)
+            return response
         else:
             return jsonify({"error": "Failed to generate CSV"}), 400
             
@@ -953,4 +1701,5 @@ def download_csv(filename):
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8501, debug=True)
+    # Local development only; containers run under gunicorn (see gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=8501, debug=os.environ.get('FLASK_ENV') == 'development')
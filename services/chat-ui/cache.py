@@ -0,0 +1,161 @@
+"""Caching helpers for slowly-changing MCP metadata."""
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from cachetools import TTLCache
+
+try:
+    import redis  # Optional: only used if REDIS_URL is set
+except Exception:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.environ.get("REDIS_URL")
+# Version checks run on every chat and context request; a hung Redis must fail fast so they fall
+# back to the uncached path instead of stalling
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", "0.5"))
+
+_redis = redis.Redis.from_url(
+    REDIS_URL,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+) if redis is not None and REDIS_URL else None
+
+# Per-process layer in front of Redis so hot keys skip the network round trip
+LOCAL_CACHE_TTL = int(os.environ.get("LOCAL_CACHE_TTL", "30"))
+_local = TTLCache(maxsize=64, ttl=LOCAL_CACHE_TTL)
+_local_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+# Last value accepted for each key, kept past expiry for callers that prefer stale data to a failed load
+_last_good: Dict[str, Any] = {}
+# Failed loads as (exception, result), reused briefly so callers queued on a key's lock (and those
+# right behind them) don't each wait out the same timeout in turn
+FAILED_LOAD_TTL = int(os.environ.get("FAILED_LOAD_TTL", "5"))
+_failed = TTLCache(maxsize=64, ttl=FAILED_LOAD_TTL)
+
+
+def cached(key: str, ttl: int, fn: Callable[[], Any],
+           cache_if: Optional[Callable[[Any], bool]] = None,
+           serve_stale: bool = False) -> Any:
+    """Return fn() through an in-process TTL cache and Redis.
+
+    The in-process layer holds values for at most LOCAL_CACHE_TTL seconds.
+    Concurrent misses on the same key wait for a single load instead of
+    all calling fn(). A failed load (an exception, or a value cache_if rejects)
+    is replayed to callers for FAILED_LOAD_TTL seconds before fn() is tried again.
+
+    Args:
+        key: Cache key to store the value under
+        ttl: Redis expiry in seconds (SETEX), so stale values self-evict
+        fn: Loader called on a miss
+        cache_if: Optional predicate; values it rejects are returned but not stored
+        serve_stale: Return the last accepted value instead of one cache_if rejects
+
+    Returns:
+        The cached or freshly loaded value
+    """
+    with _local_lock:
+        if key in _local:
+            return _local[key]
+        failure = _failed.get(key)
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    if failure is not None:
+        return _replay(failure)
+
+    with key_lock:
+        with _local_lock:
+            if key in _local:
+                return _local[key]
+            failure = _failed.get(key)
+        if failure is not None:
+            return _replay(failure)
+        try:
+            value = _load(key, ttl, fn, cache_if)
+        except Exception as e:
+            with _local_lock:
+                _failed[key] = (e, None)
+            raise
+        with _local_lock:
+            if cache_if is None or cache_if(value):
+                _local[key] = value
+                if serve_stale:
+                    _last_good[key] = value
+                return value
+            if serve_stale and key in _last_good:
+                logger.warning("Serving stale value for %s after a failed refresh", key)
+                value = _last_good[key]
+            _failed[key] = (None, value)
+        return value
+
+
+def _replay(failure):
+    """Raise or return the outcome of a recent failed load."""
+    error, value = failure
+    if error is not None:
+        raise error
+    return value
+
+
+def _load(key: str, ttl: int, fn: Callable[[], Any],
+          cache_if: Optional[Callable[[Any], bool]]) -> Any:
+    """Read key from Redis, falling back to fn() and storing its result."""
+    if _redis is None:
+        return fn()
+
+    try:
+        raw = _redis.get(key)
+        if raw is not None:
+            return orjson.loads(raw)
+    except redis.RedisError as e:
+        logger.warning("Redis read failed for %s: %s", key, e)
+        return fn()
+
+    value = fn()
+    if cache_if is None or cache_if(value):
+        try:
+            _redis.setex(key, ttl, orjson.dumps(value))
+        except redis.RedisError as e:
+            logger.warning("Redis write failed for %s: %s", key, e)
+    return value
+
+
+# Version counters let every worker notice writes made by the others; they expire once idle for a day
+VERSION_TTL = 24 * 3600
+_local_versions: Dict[str, int] = {}
+
+
+def get_version(key: str) -> Optional[int]:
+    """Return the current value of a version counter, or None if it can't be read.
+
+    Without Redis the counter is per-process, so only this worker's writes are seen.
+    """
+    if _redis is None:
+        with _local_lock:
+            return _local_versions.get(key, 0)
+    try:
+        raw = _redis.get(key)
+    except redis.RedisError as e:
+        logger.warning("Redis read failed for %s: %s", key, e)
+        return None
+    return int(raw) if raw is not None else 0
+
+
+def bump_version(key: str) -> Optional[int]:
+    """Increment a version counter and return its new value, or None if Redis is unavailable."""
+    if _redis is None:
+        with _local_lock:
+            _local_versions[key] = _local_versions.get(key, 0) + 1
+            return _local_versions[key]
+    try:
+        pipe = _redis.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, VERSION_TTL)
+        return pipe.execute()[0]
+    except redis.RedisError as e:
+        logger.warning("Redis write failed for %s: %s", key, e)
+        return None
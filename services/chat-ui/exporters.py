@@ -1,10 +1,17 @@
 """Export functionality for chat transcripts."""
 
-import json
-import os
 from datetime import datetime
+from pathlib import Path
 from typing import Any, Dict, List
 
+import orjson
+
+# Created once at import; exporters only join a filename onto it
+EXPORTS_DIR = Path("exports")
+EXPORTS_DIR.mkdir(exist_ok=True)
+# Write buffer for transcript files, large enough that most exports reach disk in one syscall
+_WRITE_BUFFER = 1 << 20
+
 
 def export_json(chat_history: List[Dict[str, Any]], filename: str = None) -> str:
     """Export chat history to JSON format.
@@ -20,30 +27,26 @@ def export_json(chat_history: List[Dict[str, Any]], filename: str = None) -> str
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"transcript_{timestamp}.json"
     
-    # Ensure exports directory exists
-    os.makedirs("exports", exist_ok=True)
-    filepath = os.path.join("exports", filename)
+    filepath = str(EXPORTS_DIR / filename)
     
-    # Prepare export data
-    export_data = {
-        "exported_at": datetime.now().isoformat(),
-        "total_turns": len(chat_history),
-        "turns": []
-    }
-    
-    for i, turn in enumerate(chat_history):
-        turn_data = {
-            "turn_number": i + 1,
-            "timestamp": turn.get("timestamp", datetime.now().isoformat()),
-            "role": turn["role"],
-            "text": turn["text"],
-            "tool_calls": turn.get("citations", [])
-        }
-        export_data["turns"].append(turn_data)
+    exported_at = datetime.now().isoformat()
     
-    # Write to file
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
+    # Stream one turn per line so only the current turn is ever encoded in memory;
+    # orjson emits UTF-8 bytes directly
+    with open(filepath, "wb", buffering=_WRITE_BUFFER) as f:
+        f.write(b'{"exported_at":' + orjson.dumps(exported_at) +
+                b',"total_turns":' + str(len(chat_history)).encode() + b',"turns":[')
+        for i, turn in enumerate(chat_history):
+            turn_data = {
+                "turn_number": i + 1,
+                "timestamp": turn.get("timestamp", exported_at),
+                "role": turn["role"],
+                "text": turn["text"],
+                "tool_calls": turn.get("citations", [])
+            }
+            f.write(b"\n" if i == 0 else b",\n")
+            f.write(orjson.dumps(turn_data))
+        f.write(b"\n]}\n")
     
     return filepath
 
@@ -62,49 +65,49 @@ def export_markdown(chat_history: List[Dict[str, Any]], filename: str = None) ->
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"transcript_{timestamp}.md"
     
-    # Ensure exports directory exists
-    os.makedirs("exports", exist_ok=True)
-    filepath = os.path.join("exports", filename)
+    filepath = str(EXPORTS_DIR / filename)
+    
+    # Build the document in memory and write it once
+    parts = [
+        "# Chat Transcript\n\n",
+        f"**Exported:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+        f"**Total Turns:** {len(chat_history)}\n\n",
+        "---\n\n",
+    ]
     
-    with open(filepath, "w", encoding="utf-8") as f:
-        # Write header
-        f.write("# Chat Transcript\n\n")
-        f.write(f"**Exported:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"**Total Turns:** {len(chat_history)}\n\n")
-        f.write("---\n\n")
+    # Write each turn
+    for i, turn in enumerate(chat_history):
+        role = turn["role"].upper()
+        text = turn["text"]
         
-        # Write each turn
-        for i, turn in enumerate(chat_history):
-            role = turn["role"].upper()
-            text = turn["text"]
-            
-            f.write(f"## Turn {i + 1}: {role}\n\n")
-            f.write(f"{text}\n\n")
-            
-            # Write tool calls if any
-            citations = turn.get("citations", [])
-            if citations:
-                f.write("### Tool Calls\n\n")
-                for j, citation in enumerate(citations):
-                    f.write(f"**Tool {j + 1}:** {citation.get('tool', 'Unknown')}\n\n")
-                    
-                    if "args" in citation:
-                        f.write("**Arguments:**\n")
-                        f.write("```json\n")
-                        f.write(json.dumps(citation["args"], indent=2))
-                        f.write("\n```\n\n")
-                    
-                    if "result_count" in citation:
-                        f.write(f"**Results:** {citation['result_count']} items\n\n")
-                    
-                    if "result_summary" in citation:
-                        f.write(f"**Summary:** {citation['result_summary']}\n\n")
-                    
-                    if "error" in citation:
-                        f.write(f"**Error:** {citation['error']}\n\n")
+        parts.append(f"## Turn {i + 1}: {role}\n\n")
+        parts.append(f"{text}\n\n")
+        
+        # Write tool calls if any
+        citations = turn.get("citations", [])
+        if citations:
+            parts.append("### Tool Calls\n\n")
+            for j, citation in enumerate(citations):
+                parts.append(f"**Tool {j + 1}:** {citation.get('tool', 'Unknown')}\n\n")
+                
+                if "args" in citation:
+                    parts.append("**Arguments:**\n")
+                    parts.append("```json\n")
+                    parts.append(orjson.dumps(citation["args"], option=orjson.OPT_INDENT_2).decode())
+                    parts.append("\n```\n\n")
+                
+                if "result_count" in citation:
+                    parts.append(f"**Results:** {citation['result_count']} items\n\n")
                 
-                f.write("---\n\n")
-            else:
-                f.write("---\n\n")
+                if "result_summary" in citation:
+                    parts.append(f"**Summary:** {citation['result_summary']}\n\n")
+                
+                if "error" in citation:
+                    parts.append(f"**Error:** {citation['error']}\n\n")
+        
+        parts.append("---\n\n")
+    
+    with open(filepath, "wb", buffering=_WRITE_BUFFER) as f:
+        f.write("".join(parts).encode("utf-8"))
     
     return filepath
@@ -0,0 +1,22 @@
+"""Gunicorn settings for the chat UI."""
+
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8501")
+
+# Chat requests mostly wait on OpenAI, MCP servers and MongoDB, so size for
+# concurrency: a few processes per core, each with a pool of threads
+workers = int(os.environ.get("GUNICORN_WORKERS", (os.cpu_count() or 1) * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+# Used instead of threads by GUNICORN_WORKER_CLASS=gevent (gevent ships in requirements.txt):
+# each worker then multiplexes this many chats, yielding while they wait on sockets
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+keepalive = 30
+# Multi-round tool chats can legitimately take minutes
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "300"))
+
+# Each worker imports the app itself so its MongoClient, thread pools and HTTP
+# sessions are created after the fork; PyMongo clients are not fork-safe
+preload_app = False
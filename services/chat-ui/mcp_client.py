@@ -2,16 +2,31 @@
 
 import json
 import os
+import threading
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
 MCP_SERVERS = json.loads(os.environ.get("MCP_SERVERS", "[]"))
 
+# One keep-alive pool per process for every call to the MCP servers; sized for the
+# tool-call pool plus request threads. Only connection failures and idempotent requests retry.
+http_session = requests.Session()
+http_session.headers["User-Agent"] = "nautobot-mcp-chat-ui"
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=1, backoff_factor=0.1)
+)
+http_session.mount("http://", _adapter)
+http_session.mount("https://", _adapter)
+
 
 class MCPClient:
     """Client for interacting with MCP servers."""
@@ -26,7 +41,7 @@ class MCPClient:
     def get_tools(self) -> Dict[str, Any]:
         """Get the list of available tools from the server."""
         try:
-            response = requests.get(
+            response = http_session.get(
                 f"{self.server_url}/tools",
                 headers=self.headers,
                 timeout=10
@@ -64,7 +79,7 @@ class MCPClient:
         """Invoke a tool on the server."""
         try:
             request_data = {"tool_name": tool_name, "args": args}
-            response = requests.post(
+            response = http_session.post(
                 f"{self.server_url}/tools/invoke",
                 json=request_data,
                 headers=self.headers,
@@ -108,7 +123,7 @@ class MCPClient:
     def health_check(self) -> Dict[str, Any]:
         """Check the health of the server."""
         try:
-            response = requests.get(
+            response = http_session.get(
                 f"{self.server_url}/healthz",
                 timeout=5
             )
@@ -148,7 +163,7 @@ class MCPClient:
     def get_context_window(self) -> Dict[str, Any]:
         """Get the context window information (tool catalogs)."""
         try:
-            tools_response = requests.get(
+            tools_response = http_session.get(
                 f"{self.server_url}/tools",
                 headers=self.headers,
                 timeout=10
@@ -178,8 +193,20 @@ class MCPClient:
             }
 
 
-# Global client instances for tracking
+# Global client instances for tracking; these (and their call history) are per process,
+# so each gunicorn worker keeps its own
 _clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(server_name: str, server_url: str) -> MCPClient:
+    """Get the client for a server, creating it on first use."""
+    client = _clients.get(server_name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.setdefault(server_name, MCPClient(server_url))
+    return client
+
 
 def get_server_catalogs() -> Dict[str, Any]:
     """Get tool catalogs from all configured MCP servers."""
@@ -189,11 +216,7 @@ def get_server_catalogs() -> Dict[str, Any]:
         server_name = server_config["name"]
         server_url = server_config["url"]
         
-        # Create or get existing client
-        if server_name not in _clients:
-            _clients[server_name] = MCPClient(server_url)
-        
-        client = _clients[server_name]
+        client = _get_client(server_name, server_url)
         catalog = client.get_tools()
         catalogs[server_name] = catalog
     
@@ -207,23 +230,25 @@ def invoke_tool_on_server(server_name: str, tool_name: str, args: Dict[str, Any]
     if not server_config:
         return {"error": f"Server '{server_name}' not found"}
     
-    # Create or get existing client
-    if server_name not in _clients:
-        _clients[server_name] = MCPClient(server_config["url"])
-    
-    client = _clients[server_name]
+    client = _get_client(server_name, server_config["url"])
     return client.invoke_tool(tool_name, args)
 
 
 def get_api_call_history(server_name: str = None) -> Dict[str, List[Dict[str, Any]]]:
-    """Get API call history for all servers or a specific server."""
+    """Get API call history for all servers or a specific server.
+    
+    Only calls made by this process are included: under multiple gunicorn workers
+    each worker reports its own history.
+    """
     if server_name:
         if server_name in _clients:
             return {server_name: _clients[server_name].get_call_history()}
         return {}
     
     history = {}
-    for name, client in _clients.items():
+    with _clients_lock:
+        clients = list(_clients.items())
+    for name, client in clients:
         history[name] = client.get_call_history()
     return history
 
@@ -236,11 +261,7 @@ def get_context_windows() -> Dict[str, Dict[str, Any]]:
         server_name = server_config["name"]
         server_url = server_config["url"]
         
-        # Create or get existing client
-        if server_name not in _clients:
-            _clients[server_name] = MCPClient(server_url)
-        
-        client = _clients[server_name]
+        client = _get_client(server_name, server_url)
         context_windows[server_name] = client.get_context_window()
     
     return context_windows